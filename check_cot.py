@@ -1,40 +1,53 @@
-import pandas as pd
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 
-df = pd.read_csv('data/processed/final_results.csv')
+table = pq.read_table('data/processed/final_results.parquet',
+                      columns=['model_key', 'technique', 'task', 'prediction', 'correct', 'raw_response'])
+df = table.to_pandas()
+for c in ['technique', 'model_key', 'task']:
+    df[c] = df[c].astype('category')
+# Response lengths straight from the Arrow string buffers (code points, same as len())
+df['resp_len'] = pc.utf8_length(table['raw_response']).to_pandas()
 
 # Check a few CoT responses for proper reasoning
 cot_df = df[df['technique'] == 'cot']
 print('Checking CoT responses for step-by-step reasoning:')
 print('='*60)
 
-for i in range(min(5, len(cot_df))):
-    sample = cot_df.iloc[i]
-    print(f'\nModel: {sample["model_key"]}, Task: {sample["task"]}')
-    print(f'Response length: {len(sample["raw_response"])}')
-    step_count = sample['raw_response'].lower().count('step')
-    print(f'Contains "step": {step_count} times')
-    print(f'First 300 chars: {sample["raw_response"][:300]}')
+head = cot_df.head(5).copy()
+head['step_cnt'] = head['raw_response'].str.lower().str.count('step')
+head['first300'] = head['raw_response'].str[:300]
+for sample in head.itertuples():
+    print(f'\nModel: {sample.model_key}, Task: {sample.task}')
+    print(f'Response length: {sample.resp_len}')
+    print(f'Contains "step": {sample.step_cnt} times')
+    print(f'First 300 chars: {sample.first300}')
     print('-'*40)
 
 # Also check if CoT responses are longer than zero-shot
 print('\n' + '='*60)
 print('Response length comparison:')
-avg_lengths = df.groupby('technique')['raw_response'].apply(lambda x: x.str.len().mean())
+avg_lengths = df.groupby('technique', observed=True)['resp_len'].mean()
 for tech, length in avg_lengths.items():
     print(f'{tech}: {length:.0f} chars avg')
 
 # Check parsing success rate by technique
 print('\n' + '='*60)
 print('Parsing success rate by technique:')
-parse_success = df.groupby('technique')['prediction'].apply(lambda x: (x != '').mean() * 100)
+df['pred_nonempty'] = df['prediction'].ne('')
+parse_success = df.groupby('technique', observed=True)['pred_nonempty'].mean() * 100
 for tech, rate in parse_success.items():
     print(f'{tech}: {rate:.1f}%')
 
 # Check if CoT hurts specific tasks more
 print('\n' + '='*60)
 print('CoT vs Zero-shot by task:')
-for task in df['task'].unique():
-    cot_acc = df[(df['task']==task) & (df['technique']=='cot')]['correct'].mean()
-    zs_acc = df[(df['task']==task) & (df['technique']=='zero-shot')]['correct'].mean()
-    diff = cot_acc - zs_acc
+# reindex keeps tasks in order of appearance and leaves a NaN column when a
+# technique has no rows (e.g. right after scripts/remove_cot.py)
+pivot = (
+    df.groupby(['task', 'technique'], observed=True)['correct'].mean().unstack()
+    .reindex(index=df['task'].unique(), columns=['cot', 'zero-shot'])
+)
+pivot['diff'] = pivot['cot'] - pivot['zero-shot']
+for task, cot_acc, zs_acc, diff in pivot[['cot', 'zero-shot', 'diff']].itertuples(name=None):
     print(f'{task[:30]:30} CoT: {cot_acc:.1%} vs ZS: {zs_acc:.1%} (diff: {diff:+.1%})')
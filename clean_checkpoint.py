@@ -21,14 +21,14 @@ try:
         print(f"Found {bad_row_count} bad/failed rows to remove.")
         # Keep only the rows that are NOT in the bad_rows_mask
         good_df = df[~bad_rows_mask]
+
+        # Save the cleaned data back to the same file
+        good_df.to_csv(checkpoint_path, index=False)
+        print(f"Checkpoint cleaned. New row count: {len(good_df)}")
     else:
         print("No bad/failed rows found.")
-        good_df = df # No changes needed
+        print("No changes; file untouched.")
 
-    # Save the cleaned data back to the same file
-    good_df.to_csv(checkpoint_path, index=False)
-    
-    print(f"Checkpoint cleaned. New row count: {len(good_df)}")
     print("You can now safely re-run data_collector.py")
 
 except FileNotFoundError:
@@ -0,0 +1,45 @@
+import pandas as pd
+import os
+import sys
+
+# The shared results helpers live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from results_io import save_results_parquet
+
+print("=" * 70)
+print(" MIGRATING PROCESSED RESULTS TO PARQUET".center(70))
+print("=" * 70)
+
+# One-time conversion of the processed CSVs into the Parquet files the
+# collector, analyzer and utility scripts now read from.
+csv_paths = [
+    'data/processed/final_results.csv',
+    'data/processed/final_results_complete.csv',
+]
+
+converted = 0
+for csv_path in csv_paths:
+    if not os.path.exists(csv_path):
+        print(f"\n⏭️  Skipping {csv_path} (not found)")
+        continue
+
+    parquet_path = csv_path.replace('.csv', '.parquet')
+    print(f"\n📂 Loading data from: {csv_path}")
+    # keep_default_na=False keeps empty predictions as "" rather than NaN
+    df = pd.read_csv(csv_path, keep_default_na=False)
+
+    save_results_parquet(df, parquet_path)
+
+    csv_size = os.path.getsize(csv_path) / 1024
+    parquet_size = os.path.getsize(parquet_path) / 1024
+    print(f"💾 SAVED: {len(df)} rows written to {parquet_path}")
+    print(f"   Size: {csv_size:,.0f} KB (CSV) -> {parquet_size:,.0f} KB (Parquet)")
+    converted += 1
+
+if converted == 0:
+    print("\n❌ ERROR: No processed CSV files found!")
+    print("Make sure you're in the project root directory.")
+    exit(1)
+
+print(f"\n✅ Migrated {converted} file(s). The original CSVs were left in place.")
+print("\n" + "=" * 70)
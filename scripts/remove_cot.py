@@ -1,12 +1,17 @@
 import pandas as pd
 import os
+import sys
+
+# The shared results helpers live in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from results_io import save_results_parquet
 
 print("=" * 70)
 print(" REMOVING CoT ROWS FOR RE-RUN".center(70))
 print("=" * 70)
 
 # Load current data
-data_path = 'data/processed/final_results.csv'
+data_path = 'data/processed/final_results.parquet'
 
 if not os.path.exists(data_path):
     print(f"\n❌ ERROR: {data_path} not found!")
@@ -14,36 +19,50 @@ if not os.path.exists(data_path):
     exit(1)
 
 print(f"\n📂 Loading data from: {data_path}")
-df = pd.read_csv(data_path)
+# Only the technique column is needed to report the current state
+techniques = pd.read_parquet(data_path, columns=['technique'])['technique'].astype('category')
 
 print(f"\n📊 CURRENT STATE:")
-print(f"   Total rows: {len(df)}")
+print(f"   Total rows: {len(techniques)}")
 print(f"\n   Breakdown by technique:")
-print(df['technique'].value_counts().sort_index())
+print(techniques.value_counts().sort_index())
 
 # Count CoT rows to be removed
-cot_count = len(df[df['technique'] == 'cot'])
+cot_count = int((techniques == 'cot').sum())
 print(f"\n🗑️  Rows to remove: {cot_count} (CoT experiments)")
 
-# Keep everything EXCEPT CoT
-df_cleaned = df[df['technique'] != 'cot'].copy()
+if cot_count == 0:
+    print(f"\n✅ No CoT rows found. {data_path} left untouched.")
+    print("\n" + "=" * 70)
+    exit(0)
+
+# Full load (including raw_response) only when the file will be rewritten
+df = pd.read_parquet(data_path)
+for c in ['technique', 'model_key', 'task']:
+    df[c] = df[c].astype('category')
+drop_idx = df.index[df['technique'] == 'cot']
+
+# Keep everything EXCEPT CoT. drop() still builds the filtered frame before
+# swapping it in, but skips the extra full .copy() the mask filter needed
+df.drop(drop_idx, inplace=True)
+df['technique'] = df['technique'].cat.remove_unused_categories()
 
 print(f"\n📊 AFTER REMOVAL:")
-print(f"   Remaining rows: {len(df_cleaned)}")
-print(f"   Expected after re-run: {len(df_cleaned) + 150}")
+print(f"   Remaining rows: {len(df)}")
+print(f"   Expected after re-run: {len(df) + 150}")
 
 print(f"\n   Breakdown of remaining data:")
-print(df_cleaned['technique'].value_counts().sort_index())
+print(df['technique'].value_counts().sort_index())
 
 # Verify we still have all models and tasks
 print(f"\n✅ VERIFICATION:")
-print(f"   Models remaining: {df_cleaned['model_key'].nunique()} (expected: 3)")
-print(f"   Tasks remaining: {df_cleaned['task'].nunique()} (expected: 5)")
-print(f"   Zero-shot rows: {len(df_cleaned[df_cleaned['technique']=='zero-shot'])} (expected: 150)")
-print(f"   Few-shot rows: {len(df_cleaned[df_cleaned['technique']=='few-shot'])} (expected: 150)")
+print(f"   Models remaining: {df['model_key'].nunique()} (expected: 3)")
+print(f"   Tasks remaining: {df['task'].nunique()} (expected: 5)")
+print(f"   Zero-shot rows: {len(df[df['technique']=='zero-shot'])} (expected: 150)")
+print(f"   Few-shot rows: {len(df[df['technique']=='few-shot'])} (expected: 150)")
 
 # Save the cleaned data
-df_cleaned.to_csv(data_path, index=False)
+save_results_parquet(df, data_path)
 
 print(f"\n💾 SAVED: Cleaned data written to {data_path}")
 print(f"\n✅ Ready to re-run data_collector.py!")
@@ -1,9 +1,10 @@
+import argparse
 import pandas as pd
 import yaml
 import os
 import matplotlib.pyplot as plt
 import seaborn as sns
-from scipy.stats import chi2_contingency
+from scipy.special import chdtrc
 
 def load_config(config_path='config.yaml'):
     """Loads the main YAML config file."""
@@ -18,13 +19,15 @@ def validate_data(df, expected_rows=450):
     if len(df) != expected_rows:
         issues.append(f"Expected {expected_rows} rows, got {len(df)}")
     
-    # Check for empty predictions (parser failures)
-    empty_preds = (df['prediction_final'] == '').sum() + df['prediction_final'].isna().sum()
+    # Check for empty predictions (parser failures): NaN or blank, in one mask
+    pf = df['prediction_final']
+    empty_mask = pf.isna() | (pf == '')
+    empty_preds = empty_mask.sum()
     if empty_preds > 0:
         issues.append(f"Found {empty_preds} empty predictions ({empty_preds/len(df)*100:.1f}%)")
     
-    # Check for balanced samples
-    combo_counts = df.groupby(['model_key', 'technique', 'task']).size()
+    # Check for balanced samples (keys are categorical, so this groups on integer codes)
+    combo_counts = df.groupby(['model_key', 'technique', 'task'], observed=True).size()
     if not combo_counts.eq(10).all():
         issues.append("Unbalanced samples per combination (expected 10 each)")
     
@@ -37,24 +40,43 @@ def validate_data(df, expected_rows=450):
     
     return True  # Continue analysis even with warnings
 
-def detect_emergence(df):
+def cell_counts(df):
+    """Correct/total counts per (model, technique, task) cell, computed in one pass"""
+    return df.groupby(['model_key', 'technique', 'task'], observed=True)['correct_final'].agg(['sum', 'count'])
+
+def rollup_accuracy(cells, index, columns):
+    """Pool cell counts up to an index x columns accuracy table"""
+    totals = cells.groupby(level=[index, columns], observed=True).sum()
+    return (totals['sum'] / totals['count']).unstack(columns)
+
+def model_technique_accuracy(cells):
+    """Accuracy per model (rows, in scale order) and technique (columns), computed once"""
+    return (
+        rollup_accuracy(cells, 'model_key', 'technique')
+        .reindex(index=['llama-8b', 'llama-70b', 'gemini-pro'], columns=['zero-shot', 'few-shot', 'cot'], fill_value=0)
+        .fillna(0)  # reindex only fills labels it adds; cells missing inside unstack stay NaN
+        .astype('float64')  # plain floats: the nullable counts would make comparisons return <NA>
+    )
+
+def detect_emergence(df, acc_mt):
     """Check for emergence following Wei et al. (2022) criteria"""
     print("\n--- 2. Detecting Emergence ---")
     
-    # Calculate accuracy per model and technique
-    accuracy = df.groupby(['model_key', 'technique'])['correct_final'].mean()
+    # Accuracy per technique and model (techniques x models, in scale order)
+    accuracy = acc_mt.T
+    
+    # jump_1 = 70B - 8B, jump_2 = Gemini - 70B for every technique at once
+    jumps = accuracy.diff(axis=1)
+    
+    # Wei's emergence criteria: >15% jump AND discontinuous (2x previous jump)
+    emergence_flags = (jumps['gemini-pro'] > 0.15) & (jumps['gemini-pro'] > 2 * jumps['llama-70b'])
     
     results = {}
-    for technique in ['zero-shot', 'few-shot', 'cot']:
-        acc_8b = accuracy.get(('llama-8b', technique), 0)
-        acc_70b = accuracy.get(('llama-70b', technique), 0)
-        acc_gemini = accuracy.get(('gemini-pro', technique), 0)
-        
-        jump_1 = acc_70b - acc_8b
-        jump_2 = acc_gemini - acc_70b
-        
-        # Wei's emergence criteria: >15% jump AND discontinuous (2x previous jump)
-        emergence = jump_2 > 0.15 and jump_2 > (jump_1 * 2)
+    for technique in accuracy.index:
+        acc_8b, acc_70b, acc_gemini = accuracy.loc[technique]
+        jump_1 = jumps.loc[technique, 'llama-70b']
+        jump_2 = jumps.loc[technique, 'gemini-pro']
+        emergence = bool(emergence_flags[technique])
         
         results[technique] = {
             'acc_8b': acc_8b, 
@@ -74,22 +96,26 @@ def detect_emergence(df):
     
     return results
 
-def cost_benefit_analysis(df):
+def cost_benefit_analysis(df, acc_mt):
     """Calculate token efficiency per technique"""
     print("\n--- 3. Cost-Benefit Analysis ---")
     
-    avg_tokens = df.groupby('technique')['input_tokens'].mean()
-    accuracy = df.groupby(['model_key', 'technique'])['correct_final'].mean()
+    avg_tokens = df.groupby('technique', observed=True)['input_tokens'].mean()
+    accuracy = acc_mt.T
+    avg_tokens = avg_tokens.reindex(accuracy.index, fill_value=0)
+    
+    # Tokens per correct answer for every (technique, model) cell at once
+    # (zero-accuracy cells are masked out; they print as N/A below)
+    efficiency = accuracy.where(accuracy > 0).rdiv(avg_tokens, axis=0)
     
-    for model_key in ['llama-8b', 'llama-70b', 'gemini-pro']:
+    for model_key in accuracy.columns:
         print(f"\n{model_key.upper()}:")
-        for technique in ['zero-shot', 'few-shot', 'cot']:
-            acc = accuracy.get((model_key, technique), 0)
-            tokens = avg_tokens.get(technique, 0)
+        for technique in accuracy.index:
+            acc = accuracy.loc[technique, model_key]
+            tokens = avg_tokens[technique]
             
             if acc > 0:
-                efficiency = tokens / acc
-                print(f"  {technique:>10}: {efficiency:,.0f} tokens/correct (Acc: {acc:.1%}, Avg tokens: {tokens:.0f})")
+                print(f"  {technique:>10}: {efficiency.loc[technique, model_key]:,.0f} tokens/correct (Acc: {acc:.1%}, Avg tokens: {tokens:.0f})")
             else:
                 print(f"  {technique:>10}: N/A (Acc: 0.0%, no correct answers)")
 
@@ -123,25 +149,47 @@ def compare_to_literature(emergence_results):
         print("\n  🤝 VERDICT: Mixed results.")
         print("     Some techniques show emergence while others scale smoothly.")
 
+def chi2_2x2(a, b, c, d):
+    """
+    Closed-form chi-squared test for the 2x2 table [[a, b], [c, d]].
+
+    Applies Yates' continuity correction, matching scipy's chi2_contingency
+    default for 2x2 tables.
+
+    Returns:
+        tuple: (chi2, p_value)
+    """
+    n = a + b + c + d
+    denom = (a + b) * (c + d) * (a + c) * (b + d)
+    if denom == 0:
+        raise ValueError("contingency table has a zero row or column total")
+    
+    chi2 = n * max(0.0, abs(a * d - b * c) - n / 2) ** 2 / denom
+    return chi2, chdtrc(1, chi2)
+
 def test_significance(df):
     """Test if technique improvements are statistically significant (Chi-squared)"""
     print("\n--- 5. Statistical Significance (vs. Zero-Shot Baseline) ---")
     
-    for model_key in ['llama-8b', 'llama-70b', 'gemini-pro']:
+    models = ['llama-8b', 'llama-70b', 'gemini-pro']
+    techniques = ['zero-shot', 'few-shot', 'cot']
+    
+    # (correct, total) for every (model, technique) in a single pass, as a
+    # plain (model, technique, 2) integer array so the loop does no pandas lookups
+    counts = df.groupby(['model_key', 'technique'], observed=True)['correct_final'].agg(['sum', 'size'])
+    counts = counts.reindex(pd.MultiIndex.from_product([models, techniques]), fill_value=0)
+    counts = counts.to_numpy(dtype='int64').reshape(len(models), len(techniques), 2)
+    
+    for m, model_key in enumerate(models):
         print(f"\n{model_key.upper()}:")
-        zero_shot = df[(df['model_key'] == model_key) & (df['technique'] == 'zero-shot')]
+        zc, zn = counts[m, 0]
         
-        for technique in ['few-shot', 'cot']:
-            technique_data = df[(df['model_key'] == model_key) & (df['technique'] == technique)]
-            
-            # Build contingency table: [[correct, incorrect], [correct, incorrect]]
-            contingency = [
-                [zero_shot['correct_final'].sum(), len(zero_shot) - zero_shot['correct_final'].sum()],
-                [technique_data['correct_final'].sum(), len(technique_data) - technique_data['correct_final'].sum()]
-            ]
+        for t, technique in enumerate(techniques[1:], start=1):
+            tc, tn = counts[m, t]
             
             try:
-                chi2, p_value, dof, expected = chi2_contingency(contingency)
+                # Contingency table: [[correct, incorrect], [correct, incorrect]]
+                chi2, p_value = chi2_2x2(zc, zn - zc, tc, tn - tc)
                 
                 if p_value < 0.05:
                     print(f"  {technique:>10} vs. Zero-Shot: p={p_value:.4f} ✓ (Significant at α=0.05)")
@@ -151,8 +199,8 @@ def test_significance(df):
             except ValueError as e:
                 print(f"  {technique:>10} vs. Zero-Shot: Could not compute (error: {e})")
 
-def plot_scaling_curves(df, emergence_results, save_path):
-    """Generate scaling curve visualization"""
+def plot_scaling_curves(df, emergence_results, save_path, dpi=150):
+    """Generate scaling curve visualization (use dpi=300 for publication figures)"""
     print("\n--- 6. Generating Scaling Curve Plot ---")
     
     # Ensure output directory exists
@@ -198,7 +246,7 @@ def plot_scaling_curves(df, emergence_results, save_path):
     plt.tight_layout()
     
     final_path = os.path.join(save_path, 'scaling_curves_final.png')
-    plt.savefig(final_path, dpi=300, bbox_inches='tight')
+    plt.savefig(final_path, dpi=dpi, bbox_inches='tight')
     print(f"✅ Plot saved to {final_path}")
     plt.close()
 
@@ -206,23 +254,18 @@ def task_difficulty_analysis(df):
     """Rank tasks by overall difficulty"""
     print("\n--- 7. Task Difficulty Ranking ---")
     
-    task_acc = df.groupby('task')['correct_final'].mean().sort_values(ascending=False)
+    task_acc = df.groupby('task', observed=True)['correct_final'].mean().sort_values(ascending=False)
     
     print(f"{'Task':<45} {'Accuracy':>10}")
     print("-" * 57)
     for task, acc in task_acc.items():
         print(f"{task:<45} {acc:>9.1%}")
 
-def task_model_breakdown(df):
+def task_model_breakdown(cells):
     """Show which models excel at which tasks"""
     print("\n--- 8. Task × Model Performance Matrix ---")
     
-    pivot = df.pivot_table(
-        values='correct_final', 
-        index='task', 
-        columns='model_key', 
-        aggfunc='mean'
-    )
+    pivot = rollup_accuracy(cells, 'task', 'model_key')
     
     # Format as percentages
     print(f"\n{'Task':<45} {'8B':>8} {'70B':>8} {'Gemini':>8}")
@@ -230,20 +273,13 @@ def task_model_breakdown(df):
     for task in pivot.index:
         print(f"{task:<45} {pivot.loc[task, 'llama-8b']:>7.1%} {pivot.loc[task, 'llama-70b']:>7.1%} {pivot.loc[task, 'gemini-pro']:>7.1%}")
 
-def generate_summary_table(df, save_path):
+def generate_summary_table(cells, acc_mt, save_path):
     """Create accuracy summary table for report"""
     print("\n--- 9. Generating Summary Tables ---")
     
-    # Main accuracy table
-    summary = df.pivot_table(
-        values='correct_final',
-        index='technique',
-        columns='model_key',
-        aggfunc='mean'
-    )
-    
-    # Reorder columns for readability
-    summary = summary[['llama-8b', 'llama-70b', 'gemini-pro']]
+    # Main accuracy table (techniques x models, models already in scale order;
+    # techniques listed alphabetically as in earlier reports)
+    summary = acc_mt.T.sort_index()
     
     # Save as CSV
     summary_path = os.path.join(save_path, 'accuracy_summary_final.csv')
@@ -255,12 +291,7 @@ def generate_summary_table(df, save_path):
     print(summary.to_string(float_format=lambda x: f'{x:.1%}'))
     
     # Task-specific table
-    task_summary = df.pivot_table(
-        values='correct_final',
-        index='task',
-        columns='technique',
-        aggfunc='mean'
-    )
+    task_summary = rollup_accuracy(cells, 'task', 'technique')
     
     task_path = os.path.join(save_path, 'task_accuracy_final.csv')
     task_summary.to_csv(task_path)
@@ -270,6 +301,11 @@ def generate_summary_table(df, save_path):
 # Main Execution
 # ============================================================
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the emergence analysis pipeline")
+    parser.add_argument('--publication', action='store_true',
+                        help="Save figures at 300 dpi instead of the faster 150 dpi default")
+    args = parser.parse_args()
+    
     print("=" * 70)
     print(" EMERGENCE ANALYSIS - Final Results with Fixed Parser".center(70))
     print("=" * 70)
@@ -280,8 +316,27 @@ if __name__ == "__main__":
     
     # Load the FIXED data with comprehensive parser
     try:
-        df = pd.read_csv('data/processed/final_results_complete.csv')
-        print(f"\n✅ Loaded {len(df)} rows from final_results_complete.csv")
+        # raw_response is never used here, so skip reading it entirely
+        data_path = 'data/processed/final_results_complete.parquet'
+        columns = ['model_key', 'technique', 'task', 'prediction_final', 'correct_final', 'input_tokens']
+        if not os.path.exists(data_path):
+            # The parser fix writes CSV; read it directly until scripts/csv_to_parquet.py is run
+            data_path = data_path.replace('.parquet', '.csv')
+        if data_path.endswith('.parquet'):
+            df = pd.read_parquet(data_path, columns=columns)
+        else:
+            df = pd.read_csv(data_path, usecols=columns)
+        # Compact dtypes: integer-coded keys, 1-byte flags and int32 token counts
+        # make every mask, groupby and reduction below touch less memory
+        df['input_tokens'] = df['input_tokens'].round()
+        df = df.astype({
+            'correct_final': 'boolean',
+            'input_tokens': 'Int32',
+            'technique': 'category',
+            'model_key': 'category',
+            'task': 'category'
+        })
+        print(f"\n✅ Loaded {len(df)} rows from {os.path.basename(data_path)}")
         print(f"   Overall Accuracy: {df['correct_final'].mean():.1%}")
     except FileNotFoundError:
         print(f"\n❌ ERROR: Fixed data file not found!")
@@ -294,14 +349,16 @@ if __name__ == "__main__":
     print("=" * 70)
     
     validate_data(df)
-    emergence_results = detect_emergence(df)
-    cost_benefit_analysis(df)
+    cells = cell_counts(df)
+    acc_mt = model_technique_accuracy(cells)
+    emergence_results = detect_emergence(df, acc_mt)
+    cost_benefit_analysis(df, acc_mt)
     compare_to_literature(emergence_results)
     test_significance(df)
-    plot_scaling_curves(df, emergence_results, paths['figures_output'])
+    plot_scaling_curves(df, emergence_results, paths['figures_output'], dpi=300 if args.publication else 150)
     task_difficulty_analysis(df)
-    task_model_breakdown(df)
-    generate_summary_table(df, paths['figures_output'])
+    task_model_breakdown(cells)
+    generate_summary_table(cells, acc_mt, paths['figures_output'])
     
     print("\n" + "=" * 70)
     print(" ANALYSIS COMPLETE".center(70))
@@ -1,24 +1,76 @@
-import requests
-from groq import Groq
-from tenacity import retry, stop_after_attempt, wait_exponential
+import asyncio
+import httpx
+from groq import AsyncGroq, Groq
+from tenacity import AsyncRetrying, retry, stop_after_attempt, wait_exponential
 
-# --- API-Specific Functions ---
+GEMINI_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-pro:generateContent"
 
-def call_gemini(prompt, api_key, temperature):
-    """
-    Calls the Google Gemini API.
-    """
-    url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-pro:generateContent"
+# Clients are created on first use and shared by every call, so the
+# connection pool and TLS session are set up once per run instead of per call.
+_gemini_client = None
+_groq_clients = {}
+_gemini_async_client = None
+_groq_async_clients = {}
+
+
+def _get_gemini_client():
+    global _gemini_client
+    if _gemini_client is None:
+        _gemini_client = httpx.Client(
+            http2=True,
+            timeout=60.0,
+            limits=httpx.Limits(max_keepalive_connections=16)
+        )
+    return _gemini_client
+
+
+def _get_groq_client(api_key):
+    if api_key not in _groq_clients:
+        _groq_clients[api_key] = Groq(api_key=api_key)
+    return _groq_clients[api_key]
+
+
+def _get_gemini_async_client():
+    global _gemini_async_client
+    if _gemini_async_client is None:
+        _gemini_async_client = httpx.AsyncClient(
+            http2=True,
+            timeout=60.0,
+            limits=httpx.Limits(max_keepalive_connections=16)
+        )
+    return _gemini_async_client
+
+
+def _get_groq_async_client(api_key):
+    if api_key not in _groq_async_clients:
+        _groq_async_clients[api_key] = AsyncGroq(api_key=api_key)
+    return _groq_async_clients[api_key]
+
+# --- Shared Request/Response Handling (used by the sync and async calls) ---
+
+# Retry policy shared by api_call_with_retry and api_call_with_retry_async
+_RETRY_POLICY = dict(
+    stop=stop_after_attempt(3),                        # Stop after 3 attempts
+    wait=wait_exponential(multiplier=1, min=4, max=10) # Wait 4s, then 8s, then 10s
+)
+
+
+def _gemini_request(prompt, api_key, temperature):
+    """Headers and JSON body for a Gemini generateContent call."""
     headers = {"x-goog-api-key": api_key}
     data = {
         "contents": [{"parts": [{"text": prompt}]}],
         "generationConfig": {"temperature": temperature}
     }
+    return headers, data
+
+
+def _gemini_text(response):
+    """Checks a Gemini response and pulls out the generated text."""
     try:
-        response = requests.post(url, headers=headers, json=data)
         response.raise_for_status() # Raises an exception for bad responses (4xx or 5xx)
         return response.json()['candidates'][0]['content']['parts'][0]['text']
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         print(f"Gemini API request failed: {e}")
         raise # Re-raise exception to be caught by tenacity
     except (KeyError, IndexError) as e:
@@ -26,16 +78,36 @@ def call_gemini(prompt, api_key, temperature):
         raise
 
 
+def _llama_request(prompt, model_name, temperature):
+    """Keyword arguments for a Groq chat completion call."""
+    return {
+        "model": model_name,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": temperature
+    }
+
+# --- API-Specific Functions ---
+
+def call_gemini(prompt, api_key, temperature):
+    """
+    Calls the Google Gemini API.
+    """
+    headers, data = _gemini_request(prompt, api_key, temperature)
+    try:
+        response = _get_gemini_client().post(GEMINI_URL, headers=headers, json=data)
+    except httpx.HTTPError as e:
+        print(f"Gemini API request failed: {e}")
+        raise # Re-raise exception to be caught by tenacity
+    return _gemini_text(response)
+
+
 def call_llama(prompt, model_name, api_key, temperature):
     """
     Calls the Groq Llama API.
     """
     try:
-        client = Groq(api_key=api_key)
-        response = client.chat.completions.create(
-            model=model_name,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature
+        response = _get_groq_client(api_key).chat.completions.create(
+            **_llama_request(prompt, model_name, temperature)
         )
         return response.choices[0].message.content
     except Exception as e: # Catch Groq-specific or other errors
@@ -43,12 +115,38 @@ def call_llama(prompt, model_name, api_key, temperature):
         raise # Re-raise exception to be caught by tenacity
 
 
+# --- Async API Functions ---
+
+async def call_gemini_async(prompt, api_key, temperature):
+    """
+    Async version of call_gemini using the shared httpx client.
+    """
+    headers, data = _gemini_request(prompt, api_key, temperature)
+    try:
+        response = await _get_gemini_async_client().post(GEMINI_URL, headers=headers, json=data)
+    except httpx.HTTPError as e:
+        print(f"Gemini API request failed: {e}")
+        raise
+    return _gemini_text(response)
+
+
+async def call_llama_async(prompt, model_name, api_key, temperature):
+    """
+    Async version of call_llama using a shared AsyncGroq client per API key.
+    """
+    try:
+        response = await _get_groq_async_client(api_key).chat.completions.create(
+            **_llama_request(prompt, model_name, temperature)
+        )
+        return response.choices[0].message.content
+    except Exception as e:
+        print(f"Llama (Groq) API request failed: {e}")
+        raise
+
+
 # --- Tenacity Retry Wrapper ---
 
-@retry(
-    stop=stop_after_attempt(3),                # Stop after 3 attempts
-    wait=wait_exponential(multiplier=1, min=4, max=10) # Wait 4s, then 8s, then 10s
-)
+@retry(**_RETRY_POLICY)
 def api_call_with_retry(api_func, **kwargs):
     """
     Wraps any API call function with exponential backoff retry logic.
@@ -61,4 +159,44 @@ def api_call_with_retry(api_func, **kwargs):
         The API response.
     """
     # print(f"Attempting call to {api_func.__name__}...") # Uncomment for debugging
-    return api_func(**kwargs)
\ No newline at end of file
+    return api_func(**kwargs)
+
+
+async def api_call_with_retry_async(api_func, **kwargs):
+    """
+    Async counterpart of api_call_with_retry with the same backoff policy.
+
+    Args:
+        api_func: The async API function to call (e.g., call_gemini_async).
+        **kwargs: Arguments to pass to the API function.
+
+    Returns:
+        The API response.
+    """
+    async for attempt in AsyncRetrying(**_RETRY_POLICY):
+        with attempt:
+            return await api_func(**kwargs)
+
+
+async def gather_with_concurrency(func, items, concurrency):
+    """
+    Runs func(item) for every item with at most `concurrency` calls in flight.
+
+    Each coroutine is created only once its slot is free, so an interrupted run
+    leaves no never-awaited coroutines behind.
+
+    Args:
+        func: Async function called with one item.
+        items: Iterable of items to process.
+        concurrency (int): Maximum number of calls running at once.
+
+    Returns:
+        list: Results in the same order as `items`.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _run(item):
+        async with semaphore:
+            return await func(item)
+
+    return await asyncio.gather(*[_run(item) for item in items])
@@ -1,19 +1,44 @@
+import asyncio
+import csv
+from collections import Counter
 import yaml
+import numpy as np
 import pandas as pd
 import os
 import random
-import time
+from aiolimiter import AsyncLimiter
 from tqdm import tqdm
 import sys
 
 # Import our custom modules from the 'src' folder
-from api_clients import api_call_with_retry, call_gemini, call_llama
-from prompt_builder import load_bbh_task, build_prompt
+from api_clients import api_call_with_retry_async, call_gemini_async, call_llama_async, gather_with_concurrency
+from prompt_builder import load_bbh_task, build_demo_prefix, build_prompt
 from response_parser import extract_answer
+from results_io import save_results_parquet
 
-def estimate_tokens(prompt):
-    """Rough token estimation for cost-benefit analysis."""
-    return len(prompt.split()) * 1.3  # A rough estimate
+def estimate_tokens(prompt, demo_prefix="", demo_prefix_words=None):
+    """
+    Rough token estimation for cost-benefit analysis.
+
+    If the prompt starts with a demo prefix whose word count is already known,
+    only the remainder is split. build_prompt always separates the prefix from
+    the question with whitespace, so the count equals splitting the whole prompt.
+    """
+    if demo_prefix_words is None:
+        return len(prompt.split()) * 1.3  # A rough estimate
+    return (demo_prefix_words + len(prompt[len(demo_prefix):].split())) * 1.3
+
+# Column order of every result row (and of the checkpoint CSV header)
+RESULT_FIELDS = ['model_key', 'model_name', 'technique', 'task', 'input', 'target',
+                 'prediction', 'correct', 'raw_response', 'input_tokens']
+
+def open_checkpoint(checkpoint_path):
+    """Opens the checkpoint CSV for appending, writing the header only when the file is new."""
+    checkpoint_file = open(checkpoint_path, 'a', newline='')
+    writer = csv.DictWriter(checkpoint_file, fieldnames=RESULT_FIELDS, lineterminator='\n')
+    if checkpoint_file.tell() == 0:
+        writer.writeheader()
+    return checkpoint_file, writer
 
 def load_config(config_path='config.yaml'):
     """Loads the main YAML config file."""
@@ -36,39 +61,54 @@ def run_experiment():
     params = config['parameters']
     paths = config['paths']
 
-    results = []
+    # Only rows not yet flushed to the checkpoint are kept in memory
+    # (a fixed-size buffer of checkpoint_interval slots, filled up to pending_count)
+    pending_rows = [None] * params['checkpoint_interval']
+    pending_count = 0
+    n_results = 0
+    tech_counts = Counter()  # Rows per technique, kept up to date on every append
+    results_df = None
+    seeded_checkpoint = False
     
     # --- LOADING LOGIC ---
     # Priority 1: Load from checkpoint (resume mid-run)
-    # Priority 2: Load from final_results.csv (resume after cleanup)
+    # Priority 2: Load from final_results.parquet (resume after cleanup)
     checkpoint_path = os.path.join(paths['checkpoints_dir'], 'checkpoint_results.csv')
-    final_results_path = paths['processed_output']
+    # Results are stored as Parquet; older configs still name the .csv file
+    final_results_path = paths['processed_output'].replace('.csv', '.parquet')
     
     if os.path.exists(checkpoint_path):
         print(f"\n📂 Found checkpoint: {checkpoint_path}")
         results_df = pd.read_csv(checkpoint_path)
-        results = results_df.to_dict('records')
-        print(f"✅ Loaded {len(results)} results from checkpoint")
+        print(f"✅ Loaded {len(results_df)} results from checkpoint")
+        tech_counts.update(results_df.groupby('technique', observed=True).size().to_dict())
         print(f"   (This checkpoint will be used to resume the run)")
     elif os.path.exists(final_results_path):
         print(f"\n📂 No checkpoint. Loading from: {final_results_path}")
-        results_df = pd.read_csv(final_results_path)
-        results = results_df.to_dict('records')
-        print(f"✅ Loaded {len(results)} existing results")
+        results_df = pd.read_parquet(final_results_path)
+        print(f"✅ Loaded {len(results_df)} existing results")
         
         # Check what we have
-        techniques_count = results_df['technique'].value_counts()
+        tech_counts.update(results_df.groupby('technique', observed=True).size().to_dict())
         print(f"\n📊 Current data breakdown:")
-        for tech, count in techniques_count.items():
+        for tech, count in tech_counts.most_common():
             print(f"   {tech}: {count} rows")
+        
+        # Seed a fresh checkpoint with the existing rows; new rows are appended to it
+        results_df.reindex(columns=RESULT_FIELDS).to_csv(checkpoint_path, index=False)
+        seeded_checkpoint = True
     else:
         print("\n🆕 No existing data found. Starting fresh.")
     
     # Build set of completed jobs (only those with valid responses)
     completed_jobs = set()
-    for res in results:
-        if pd.notnull(res.get('raw_response')) and res.get('raw_response') != "":
-            completed_jobs.add((res['model_key'], res['technique'], res['task'], res['input']))
+    if results_df is not None:
+        done = results_df.loc[results_df['raw_response'].notna() & (results_df['raw_response'] != ""),
+                              ['model_key', 'technique', 'task', 'input']]
+        completed_jobs = set(zip(done['model_key'], done['technique'], done['task'], done['input']))
+        n_results = len(results_df)
+        # The rows live on disk in the checkpoint; don't keep the table resident
+        del results_df
     
     total_jobs = len(models_config) * len(['zero-shot', 'few-shot', 'cot']) * len(tasks) * params['examples_per_task']
     remaining = total_jobs - len(completed_jobs)
@@ -80,6 +120,8 @@ def run_experiment():
     
     if remaining == 0:
         print("\n✅ All jobs already complete! Nothing to do.")
+        if seeded_checkpoint:
+            os.remove(checkpoint_path)
         print(f"📊 Final results are in: {final_results_path}")
         return
     
@@ -88,102 +130,161 @@ def run_experiment():
     
     progress_bar = tqdm(total=total_jobs, initial=len(completed_jobs))
     
+    # Kept open for the whole run; only new rows are ever written to it
+    checkpoint_file, checkpoint_writer = open_checkpoint(checkpoint_path)
+    
+    def flush_checkpoint():
+        nonlocal pending_count
+        if pending_count:
+            checkpoint_writer.writerows(pending_rows[:pending_count])
+            checkpoint_file.flush()
+            pending_count = 0
+    
+    run_complete = False
+    
     # 2. --- MAIN EXPERIMENT LOOP ---
     try:
+        # Build every pending job up front so the API calls can be dispatched concurrently
+        # The seeded split is identical for every (model, technique), so do it once per task
+        per_task_examples = {}
+        for task in tasks:
+            task_data = load_bbh_task(task, paths['bbh_dataset_dir'])
+            if not task_data:
+                print(f"⚠️  Skipping task {task} due to load error.")
+                continue
+            
+            random.seed(params['seed'])
+            shuffled_examples = random.sample(task_data['examples'], len(task_data['examples']))
+            
+            test_examples = shuffled_examples[:params['examples_per_task']]
+            demo_examples = shuffled_examples[params['examples_per_task'] : 
+                                              params['examples_per_task'] + params['few_shot_examples']]
+            per_task_examples[task] = (test_examples, demo_examples)
+        
+        pending_jobs = []
+        demo_prefixes = {}
         for model_key, model_name in models_config.items():
             for technique in ['zero-shot', 'few-shot', 'cot']:
                 for task in tasks:
                     
-                    task_data = load_bbh_task(task, paths['bbh_dataset_dir'])
-                    if not task_data:
-                        print(f"⚠️  Skipping task {task} due to load error.")
+                    if task not in per_task_examples:
                         continue
+                    test_examples, demo_examples = per_task_examples[task]
                     
-                    random.seed(params['seed'])
-                    shuffled_examples = random.sample(task_data['examples'], len(task_data['examples']))
-                    
-                    test_examples = shuffled_examples[:params['examples_per_task']]
-                    demo_examples = shuffled_examples[params['examples_per_task'] : 
-                                                      params['examples_per_task'] + params['few_shot_examples']]
+                    # Demonstration block is the same for every test example of this task,
+                    # and (same seed, same demos) for every model, so build each one once
+                    # (its word count is cached too, so long CoT prefixes are split only once)
+                    if (technique, task) not in demo_prefixes:
+                        prefix = build_demo_prefix(
+                            technique, demo_examples,
+                            task_name=task if technique == 'cot' else None  # Pass task_name for CoT
+                        )
+                        demo_prefixes[(technique, task)] = (prefix, len(prefix.split()))
+                    demo_prefix, demo_prefix_words = demo_prefixes[(technique, task)]
                     
                     for example in test_examples:
                         example_input = example['input']
-                        example_target = example['target']
                         
                         # Skip if already completed
                         if (model_key, technique, task, example_input) in completed_jobs:
                             continue
                         
-                        # BUILD PROMPT WITH TASK NAME FOR COT
                         prompt = build_prompt(
                             question=example_input, 
                             technique=technique, 
-                            demo_examples=demo_examples,
-                            task_name=task if technique == 'cot' else None  # Pass task_name for CoT
+                            demo_prefix=demo_prefix
                         )
                         
-                        input_tokens = estimate_tokens(prompt)
-                        
-                        api_args = { 'prompt': prompt, 'temperature': params['temperature'] }
-                        
-                        # Update progress bar
-                        progress_bar.update(1)
-                        
-                        # Sleep before API call (increased for stability)
-                        if model_key == 'gemini-pro':
-                            time.sleep(15)  # Google: 4 req/min to be safe
-                        else:
-                            time.sleep(2)   # Groq: give it breathing room
-                        
-                        # Set up API call
-                        if model_key == 'gemini-pro':
-                            api_func = call_gemini
-                            api_args['api_key'] = api_keys['google']
-                        else:
-                            api_func = call_llama
-                            api_args['model_name'] = model_name
-                            api_args['api_key'] = api_keys['groq']
-                        
-                        try:
-                            raw_response = api_call_with_retry(api_func, **api_args)
-                            job_key = (model_key, technique, task, example_input)
-                            completed_jobs.add(job_key)
-                            
-                            # Debug: Show first CoT response to verify it's working
-                            if technique == 'cot' and len([r for r in results if r.get('technique') == 'cot']) == 0:
-                                print(f"\n🔍 First CoT response preview (first 300 chars):")
-                                print(f"   Model: {model_key}, Task: {task}")
-                                print(f"   Response: {raw_response[:300]}...")
-                                print(f"   (Checking that model is actually reasoning step-by-step)\n")
-
-                        except Exception as e:
-                            print(f"\n❌ API call failed: {model_key}/{technique}/{task}")
-                            print(f"   Error: {str(e)[:100]}")
-                            raw_response = ""  # Log failure
-                        
-                        result_data = {
+                        pending_jobs.append({
                             'model_key': model_key,
                             'model_name': model_name,
                             'technique': technique,
                             'task': task,
                             'input': example_input,
-                            'target': example_target,
-                            'prediction': extract_answer(raw_response, task),
-                            'correct': (extract_answer(raw_response, task) == example_target),
-                            'raw_response': raw_response,
-                            'input_tokens': input_tokens
-                        }
-                        results.append(result_data)
-                        
-                        # Save checkpoint every 10 results
-                        if len(results) % params['checkpoint_interval'] == 0:
-                            pd.DataFrame(results).to_csv(checkpoint_path, index=False)
-                            # Quick stats update
-                            df_temp = pd.DataFrame(results)
-                            cot_count = len(df_temp[df_temp['technique'] == 'cot'])
-                            progress_bar.set_description(f"CoT collected: {cot_count}/150")
-                        
+                            'target': example['target'],
+                            'prompt': prompt,
+                            'input_tokens': estimate_tokens(prompt, demo_prefix, demo_prefix_words)
+                        })
+        
+        async def run_job(job, limiter):
+            nonlocal n_results, pending_count
+            model_key, technique, task = job['model_key'], job['technique'], job['task']
+            api_args = { 'prompt': job['prompt'], 'temperature': params['temperature'] }
+            
+            # Update progress bar
+            progress_bar.update(1)
+            
+            # Set up API call
+            if model_key == 'gemini-pro':
+                api_func = call_gemini_async
+                api_args['api_key'] = api_keys['google']
+            else:
+                api_func = call_llama_async
+                api_args['model_name'] = job['model_name']
+                api_args['api_key'] = api_keys['groq']
+            
+            async def rate_limited_call(**kwargs):
+                # Wait for a slot in this backend's per-minute budget (instead of a fixed
+                # sleep); acquired per attempt so tenacity retries also count against it
+                async with limiter:
+                    return await api_func(**kwargs)
+            
+            try:
+                raw_response = await api_call_with_retry_async(rate_limited_call, **api_args)
+                job_key = (model_key, technique, task, job['input'])
+                completed_jobs.add(job_key)
+                
+                # Debug: Show first CoT response to verify it's working
+                if technique == 'cot' and tech_counts['cot'] == 0:
+                    print(f"\n🔍 First CoT response preview (first 300 chars):")
+                    print(f"   Model: {model_key}, Task: {task}")
+                    print(f"   Response: {raw_response[:300]}...")
+                    print(f"   (Checking that model is actually reasoning step-by-step)\n")
+
+            except Exception as e:
+                print(f"\n❌ API call failed: {model_key}/{technique}/{task}")
+                print(f"   Error: {str(e)[:100]}")
+                raw_response = ""  # Log failure
+            
+            prediction = extract_answer(raw_response, task)
+            result_data = {
+                'model_key': model_key,
+                'model_name': job['model_name'],
+                'technique': technique,
+                'task': task,
+                'input': job['input'],
+                'target': job['target'],
+                'prediction': prediction,
+                'correct': (prediction == job['target']),
+                'raw_response': raw_response,
+                'input_tokens': job['input_tokens']
+            }
+            pending_rows[pending_count] = result_data
+            pending_count += 1
+            n_results += 1
+            tech_counts[technique] += 1
+            
+            # Flush new rows to the checkpoint every 10 results
+            if pending_count == params['checkpoint_interval']:
+                flush_checkpoint()
+                # Quick stats update
+                progress_bar.set_description(f"CoT collected: {tech_counts['cot']}/150")
+        
+        async def run_all_jobs():
+            # Each backend gets its own token bucket and in-flight cap, so requests
+            # overlap up to the provider's rate limit instead of waiting out a fixed gap
+            gemini_limiter = AsyncLimiter(params.get('gemini_rpm', 4), 60)   # Google: 4 req/min to be safe
+            groq_limiter = AsyncLimiter(params.get('groq_rpm', 30), 60)      # Groq: 30 req/min
+            gemini_jobs = [job for job in pending_jobs if job['model_key'] == 'gemini-pro']
+            groq_jobs = [job for job in pending_jobs if job['model_key'] != 'gemini-pro']
+            await asyncio.gather(
+                gather_with_concurrency(lambda job: run_job(job, gemini_limiter), gemini_jobs, params.get('gemini_concurrency', 4)),
+                gather_with_concurrency(lambda job: run_job(job, groq_limiter), groq_jobs, params.get('groq_concurrency', 30))
+            )
+        
+        asyncio.run(run_all_jobs())
                         
+
     except KeyboardInterrupt:
         print("\n\n⚠️  Experiment interrupted by user.")
     except Exception as e:
@@ -199,14 +300,25 @@ def run_experiment():
         print("=" * 70)
         
         # Final save
-        pd.DataFrame(results).to_csv(paths['processed_output'], index=False)
-        print(f"\n✅ Final results saved to: {paths['processed_output']}")
-        print(f"📊 Total results: {len(results)}")
+        flush_checkpoint()
+        checkpoint_file.close()
+        # keep_default_na=False keeps failed responses as "" rather than NaN
+        df_final = pd.read_csv(checkpoint_path, keep_default_na=False)
+        # Explicit compact dtypes: dictionary-encoded keys, 1-byte flags, int32 token counts
+        df_final['input_tokens'] = df_final['input_tokens'].round().astype(np.int32)
+        df_final = df_final.astype({
+            'model_key': 'category',
+            'technique': 'category',
+            'task': 'category',
+            'correct': 'bool'
+        })
+        save_results_parquet(df_final, final_results_path)
+        print(f"\n✅ Final results saved to: {final_results_path}")
+        print(f"📊 Total results: {len(df_final)}")
         
         # Show final breakdown
-        df_final = pd.DataFrame(results)
         print(f"\n📊 Final technique breakdown:")
-        for tech, count in df_final['technique'].value_counts().items():
+        for tech, count in tech_counts.most_common():
             print(f"   {tech}: {count} rows")
         
         # Verify CoT is now using proper reasoning
@@ -220,17 +332,19 @@ def run_experiment():
         if os.path.exists(checkpoint_path):
             os.remove(checkpoint_path)
             print("\n🗑️  Checkpoint file removed.")
+        run_complete = True
     
     finally:
         # ALWAYS runs (error, interrupt, or success)
-        if 'else' not in locals():  # If success block didn't run
+        if not run_complete:  # If success block didn't run
             progress_bar.close()
             print("\n" + "=" * 70)
             print(" SAVING PROGRESS".center(70))
             print("=" * 70)
-            pd.DataFrame(results).to_csv(checkpoint_path, index=False)
+            flush_checkpoint()
+            checkpoint_file.close()
             print(f"\n💾 Checkpoint saved: {checkpoint_path}")
-            print(f"📊 Results collected: {len(results)}")
+            print(f"📊 Results collected: {n_results}")
             print(f"🔄 Re-run the script to resume from this checkpoint.")
         
         print("\n🏁 Script shutdown complete.\n")
@@ -1,7 +1,11 @@
+import functools
 import json
 import os
 import random
 
+# Task files and CoT prompts are read-only inputs, so both loaders are memoized:
+# each file is parsed once per run instead of once per (model, technique) or per example.
+@functools.lru_cache(maxsize=None)
 def load_bbh_task(task_name, bbh_dataset_dir):
     """Loads the JSON data for a specific BBH task."""
     filepath = os.path.join(bbh_dataset_dir, f"{task_name}.json")
@@ -16,6 +20,7 @@ def load_bbh_task(task_name, bbh_dataset_dir):
         print(f"Error: Could not decode JSON from {filepath}")
         return None
 
+@functools.lru_cache(maxsize=None)
 def load_cot_demonstrations(task_name, bbh_cot_dir='data/bbh/cot-prompts'):
     """
     Load the official BBH CoT demonstrations from the cot-prompts directory.
@@ -70,33 +75,30 @@ def format_example(example_input, example_target, include_reasoning=False):
         # Regular few-shot: Just Q/A pairs
         return f"Q: {example_input}\nA: {example_target}"
 
-def build_prompt(question, technique, demo_examples, task_name=None):
+def build_demo_prefix(technique, demo_examples, task_name=None):
     """
-    Constructs the final prompt string based on the technique.
+    Builds the demonstration block that precedes the question for a technique.
+
+    The block only depends on the task and its demo examples, so callers build
+    it once per task and reuse it for every test question via build_prompt.
 
     Args:
-        question (str): The test question to be answered
         technique (str): 'zero-shot', 'few-shot', or 'cot'
         demo_examples (list of dicts): Demo examples with 'input' and 'target' keys
         task_name (str): Name of the task (REQUIRED for CoT technique)
 
     Returns:
-        str: The fully formatted prompt ready for API call
+        str: The demonstration prefix ("" for zero-shot)
     """
 
     if technique == 'zero-shot':
-        # No examples, just the question
-        return f"Q: {question}\nA:"
+        # No examples
+        return ""
 
     elif technique == 'few-shot':
         # Few-shot WITHOUT reasoning demonstrations
-        prompt_prefix = ""
-        for ex in demo_examples:
-            prompt_prefix += f"Q: {ex['input']}\nA: {ex['target']}\n\n"
-        
-        # Remove trailing newlines and add the test question
-        prompt_prefix = prompt_prefix.rstrip()
-        return f"{prompt_prefix}\n\nQ: {question}\nA:"
+        # (trailing newlines removed; build_prompt adds the separator)
+        return "".join(f"Q: {ex['input']}\nA: {ex['target']}\n\n" for ex in demo_examples).rstrip()
 
     elif technique == 'cot':
         # Load REAL CoT demonstrations from BBH cot-prompts directory
@@ -108,15 +110,39 @@ def build_prompt(question, technique, demo_examples, task_name=None):
         if cot_demonstrations is None:
             # Fallback to broken implementation if file not found
             print(f"ERROR: Could not load CoT prompts for {task_name}, using broken fallback")
-            prompt_prefix = ""
-            for ex in demo_examples:
-                prompt_prefix += format_example(ex['input'], ex['target'], include_reasoning=True)
-                prompt_prefix += "\n\n"
-            return f"{prompt_prefix}Q: {question}\nA: Let's think step by step."
+            return "\n\n".join(
+                format_example(ex['input'], ex['target'], include_reasoning=True) for ex in demo_examples
+            )
         
         # Use the real CoT demonstrations from BBH
         # The demonstrations already have the right format with full reasoning
-        return f"{cot_demonstrations}\n\nQ: {question}\nA: Let's think step by step."
+        return cot_demonstrations
+
+    else:
+        raise ValueError(f"Unknown technique: {technique}")
+
+def build_prompt(question, technique, demo_prefix):
+    """
+    Constructs the final prompt string based on the technique.
+
+    Args:
+        question (str): The test question to be answered
+        technique (str): 'zero-shot', 'few-shot', or 'cot'
+        demo_prefix (str): Demonstration block from build_demo_prefix
+
+    Returns:
+        str: The fully formatted prompt ready for API call
+    """
+
+    if technique == 'zero-shot':
+        # No examples, just the question
+        return f"Q: {question}\nA:"
+
+    elif technique == 'few-shot':
+        return f"{demo_prefix}\n\nQ: {question}\nA:"
+
+    elif technique == 'cot':
+        return f"{demo_prefix}\n\nQ: {question}\nA: Let's think step by step."
 
     else:
         raise ValueError(f"Unknown technique: {technique}")
@@ -140,12 +166,12 @@ if __name__ == "__main__":
     print("\n" + "="*70)
     print("1. ZERO-SHOT PROMPT")
     print("="*70)
-    print(build_prompt(mock_question, 'zero-shot', []))
+    print(build_prompt(mock_question, 'zero-shot', build_demo_prefix('zero-shot', [])))
 
     print("\n" + "="*70)
     print("2. FEW-SHOT PROMPT (Answer-Only)")
     print("="*70)
-    print(build_prompt(mock_question, 'few-shot', mock_demos))
+    print(build_prompt(mock_question, 'few-shot', build_demo_prefix('few-shot', mock_demos)))
 
     print("\n" + "="*70)
     print("3. TESTING REAL CoT WITH BBH PROMPTS")
@@ -158,7 +184,8 @@ if __name__ == "__main__":
     cot_file = f"data/bbh/cot-prompts/{test_task}.txt"
     if os.path.exists(cot_file):
         # Show first 500 chars of the real CoT prompt
-        cot_prompt = build_prompt("not ( False ) is", 'cot', mock_demos, task_name=test_task)
+        cot_prefix = build_demo_prefix('cot', mock_demos, task_name=test_task)
+        cot_prompt = build_prompt("not ( False ) is", 'cot', cot_prefix)
         print("First 500 characters of CoT prompt:")
         print(cot_prompt[:500])
         print("\n... [truncated]")
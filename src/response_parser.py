@@ -1,4 +1,188 @@
+import functools
+import math
 import re
+from itertools import islice
+
+# ============================================================
+# Precompiled Patterns (built once at import, not per call)
+# ============================================================
+_BOOL_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in [
+    r'(?:answer|result|final answer|final result|conclusion|therefore)[,\s]*(?:is|:)?\s*\*?\*?\s*\b(True|False)\b',
+    r'(?:evaluates to|becomes|equals)[,\s]*\*?\*?\s*\b(True|False)\b',
+    r'(?:so|thus|hence)[,\s]+(?:the answer is|it is|the result is)[,\s]*\*?\*?\s*\b(True|False)\b',
+])
+_TRUE_RE = re.compile(r'\bTrue\b', re.IGNORECASE)
+_FALSE_RE = re.compile(r'\bFalse\b', re.IGNORECASE)
+
+_MC_TASKS = frozenset({
+    'date_understanding',
+    'tracking_shuffled_objects_five_objects',
+    'geometric_shapes',
+})
+_MC_PATTERNS = tuple(re.compile(p, re.MULTILINE | re.IGNORECASE) for p in [
+    r'(?:answer|option|correct answer|correct option|conclusion) is[:\s]*\(?([A-K])\)?',
+    r'(?:so|therefore|thus|hence)[,\s]+(?:the answer is|it is)[,\s]*\(?([A-K])\)?',
+    r'\(([A-K])\)',
+    r'\*\*\(([A-K])\)\*\*',
+    r'final answer[:\s]*(?:is[:\s]*)?\$?\\?boxed\{?\(?([A-K])\)?\}?\$?',
+    r'^\s*\*?\*?\s*\(?([A-K])\)?\s*\*?\*?\s*$',
+])
+
+_WORD_NUM = re.compile(r'^\s*\d+[\.\)]\s+([a-zA-Z]\w+)')
+_WORD_TOKEN = re.compile(r'\b[a-zA-Z]{2,}\b')
+_WORD_LIST = re.compile(r'(?:answer|list|result):?\s*([\w\s,]+)', re.IGNORECASE)
+# Common English stop words and task-related words to drop from prose word lists
+_STOPWORDS = frozenset({
+    'the', 'is', 'are', 'in', 'order', 'list', 'sorted', 'words', 
+    'here', 'following', 'final', 'answer', 'alphabetically', 
+    'alphabetical', 'these', 'correct', 'now', 'below'
+})
+
+_ANSWER_TAIL = re.compile(r'answer:\s*(.*)', re.IGNORECASE | re.DOTALL)
+
+def _last_match_start(pattern, text):
+    """Start of the last match of `pattern` in `text` (-1 if none), without keeping a match list."""
+    match = None
+    for match in pattern.finditer(text):
+        pass
+    return match.start() if match else -1
+
+# ============================================================
+# Per-Task Extractors (dispatched by task name)
+# ============================================================
+def _extract_generic(response_text):
+    """General fallback: the first non-empty line after the last 'answer:'."""
+    match = _ANSWER_TAIL.search(response_text)
+    if match:
+        try:
+            answer_part = match.group(1).strip()
+            first_line = [line.strip() for line in answer_part.split('\n') if line.strip()][0]
+            return first_line.strip().strip(',')
+        except (IndexError, AttributeError):
+            pass
+    
+    return ""
+
+
+def _extract_bool(response_text):
+    """Boolean expressions: True/False, with or without markdown."""
+    # Fast path: a bare answer ("True", "False.", "**True**") resolves with
+    # plain string ops; the regex cascade would return the same word
+    if len(response_text) <= 12:
+        bare = response_text.strip('*. ').lower()
+        if bare == 'true':
+            return "True"
+        if bare == 'false':
+            return "False"
+    
+    for pattern in _BOOL_PATTERNS:
+        match = pattern.search(response_text)
+        if match:
+            return match.group(1).capitalize()
+    
+    last_part = response_text[-150:]
+    last_true_pos = _last_match_start(_TRUE_RE, last_part)
+    last_false_pos = _last_match_start(_FALSE_RE, last_part)
+    
+    if last_true_pos > last_false_pos:
+        return "True"
+    elif last_false_pos > last_true_pos:
+        return "False"
+    
+    return _extract_generic(response_text)
+
+
+def _extract_mc(response_text):
+    """Multiple-choice: a single option letter A-K."""
+    # Fast path: a bare letter ("C") or option ("(C)") by direct indexing
+    if len(response_text) == 1 and response_text.upper() in 'ABCDEFGHIJK':
+        return response_text.upper()
+    if (len(response_text) == 3 and response_text[0] == '(' and response_text[2] == ')'
+            and response_text[1].upper() in 'ABCDEFGHIJK'):
+        return response_text[1].upper()
+    
+    for pattern in _MC_PATTERNS:
+        match = pattern.search(response_text)
+        if match:
+            return match.group(1).upper()
+    
+    cleaned = response_text.strip('*()').strip()
+    if len(cleaned) == 1 and cleaned.upper() in 'ABCDEFGHIJK':
+        return cleaned.upper()
+    
+    return _extract_generic(response_text)
+
+
+def _extract_words(response_text):
+    """Word sorting: comma-separated, numbered lists, or prose."""
+    lines = response_text.split('\n')
+    
+    # Pattern 1: Numbered list (e.g., "1. bedtime\n2. boon")
+    numbered_items = []
+    for line in lines:
+        match = _WORD_NUM.match(line.strip())
+        if match:
+            numbered_items.append(match.group(1))
+    
+    if len(numbered_items) >= 4:
+        return ' '.join(numbered_items)
+    
+    # Pattern 2: Line-by-line words (e.g., "apple\nbanana\ncherry")
+    single_word_lines = []
+    for line in lines:
+        stripped = line.strip()
+        # Is this line a single alphabetic word (2+ chars)?
+        if stripped and stripped.isalpha() and len(stripped) > 1:
+            single_word_lines.append(stripped)
+    
+    if len(single_word_lines) >= 4:
+        return ' '.join(single_word_lines)
+    
+    # Pattern 3: Extract word list from anywhere in text
+    # Look for sequences of 4+ words separated by spaces/commas
+    # This handles "Here are the words in order: apple banana cherry date"
+    for line in reversed(lines[-15:]):
+        if len(line.strip()) < 20:
+            continue
+        
+        # Cheap gate: stop counting at 4 words so short lines allocate no list
+        if sum(1 for _ in islice(_WORD_TOKEN.finditer(line), 4)) < 4:
+            continue
+        
+        # Extract ALL alphabetic words (2+ chars) from the line
+        all_words = _WORD_TOKEN.findall(line)
+        
+        # Filter out common English stop words and task-related words
+        filtered_words = [w for w in all_words if w.lower() not in _STOPWORDS]
+        
+        # If we have 4+ content words after filtering, return them
+        if len(filtered_words) >= 4:
+            return ' '.join(filtered_words)
+    
+    # Pattern 4: Comma-separated list with prefix
+    match = _WORD_LIST.search(response_text)
+    if match:
+        extracted = match.group(1).strip().strip(',')
+        words = extracted.replace(',', ' ').split()
+        alphabetic_words = [w for w in words if w.isalpha() and len(w) > 1]
+        if len(alphabetic_words) >= 4:
+            return ' '.join(alphabetic_words)
+    
+    return _extract_generic(response_text)
+
+
+_EXTRACTORS = {
+    'boolean_expressions': _extract_bool,
+    'word_sorting': _extract_words,
+    **{task: _extract_mc for task in _MC_TASKS},
+}
+
+
+@functools.lru_cache(maxsize=16384)
+def _extract_cached(task_name, response_text):
+    """Memoized dispatch: rescoring passes parse the same responses repeatedly."""
+    return _EXTRACTORS.get(task_name, _extract_generic)(response_text)
+
 
 def extract_answer(response_text, task_name):
     """
@@ -19,10 +203,8 @@ def extract_answer(response_text, task_name):
         return ""
     
     # Handle pandas NaN (which is a float)
-    if isinstance(response_text, float):
-        import math
-        if math.isnan(response_text):
-            return ""
+    if isinstance(response_text, float) and math.isnan(response_text):
+        return ""
     
     # Convert to string if not already (safety check)
     response_text = str(response_text).strip()
@@ -30,137 +212,7 @@ def extract_answer(response_text, task_name):
     if not response_text:
         return ""
     
-
-    
-    # ============================================================
-    # PRIORITY 1: Boolean Expressions (Check FIRST)
-    # ============================================================
-    if task_name == 'boolean_expressions':
-        patterns = [
-            r'(?:answer|result|final answer|final result|conclusion|therefore)[,\s]*(?:is|:)?\s*\*?\*?\s*\b(True|False)\b',
-            r'(?:evaluates to|becomes|equals)[,\s]*\*?\*?\s*\b(True|False)\b',
-            r'(?:so|thus|hence)[,\s]+(?:the answer is|it is|the result is)[,\s]*\*?\*?\s*\b(True|False)\b',
-        ]
-        for pattern in patterns:
-            match = re.search(pattern, response_text, re.IGNORECASE)
-            if match:
-                return match.group(1).capitalize()
-        
-        last_part = response_text[-150:]
-        true_matches = list(re.finditer(r'\bTrue\b', last_part, re.IGNORECASE))
-        false_matches = list(re.finditer(r'\bFalse\b', last_part, re.IGNORECASE))
-        
-        last_true_pos = true_matches[-1].start() if true_matches else -1
-        last_false_pos = false_matches[-1].start() if false_matches else -1
-        
-        if last_true_pos > last_false_pos:
-            return "True"
-        elif last_false_pos > last_true_pos:
-            return "False"
-    
-    # ============================================================
-    # PRIORITY 2: Multiple-Choice (A, B, C...)
-    # ============================================================
-    if task_name in ['date_understanding', 
-                     'tracking_shuffled_objects_five_objects', 
-                     'geometric_shapes']:
-        
-        patterns = [
-            r'(?:answer|option|correct answer|correct option|conclusion) is[:\s]*\(?([A-K])\)?',
-            r'(?:so|therefore|thus|hence)[,\s]+(?:the answer is|it is)[,\s]*\(?([A-K])\)?',
-            r'\(([A-K])\)',
-            r'\*\*\(([A-K])\)\*\*',
-            r'final answer[:\s]*(?:is[:\s]*)?\$?\\?boxed\{?\(?([A-K])\)?\}?\$?',
-            r'^\s*\*?\*?\s*\(?([A-K])\)?\s*\*?\*?\s*$',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, response_text, re.MULTILINE | re.IGNORECASE)
-            if match:
-                return match.group(1).upper()
-        
-        cleaned = response_text.strip('*()').strip()
-        if len(cleaned) == 1 and cleaned.upper() in 'ABCDEFGHIJK':
-            return cleaned.upper()
-
-    # ============================================================
-    # PRIORITY 3: Word Sorting (FULLY FIXED)
-    # ============================================================
-    # ============================================================
-    # PRIORITY 3: Word Sorting (FULLY FIXED)
-    # ============================================================
-    if task_name == 'word_sorting':
-        lines = response_text.split('\n')
-        
-        # Pattern 1: Numbered list (e.g., "1. bedtime\n2. boon")
-        numbered_items = []
-        for line in lines:
-            match = re.match(r'^\s*\d+[\.\)]\s+([a-zA-Z]\w+)', line.strip())
-            if match:
-                numbered_items.append(match.group(1))
-        
-        if len(numbered_items) >= 4:
-            return ' '.join(numbered_items)
-        
-        # Pattern 2: Line-by-line words (e.g., "apple\nbanana\ncherry")
-        single_word_lines = []
-        for line in lines:
-            stripped = line.strip()
-            # Is this line a single alphabetic word (2+ chars)?
-            if stripped and stripped.isalpha() and len(stripped) > 1:
-                single_word_lines.append(stripped)
-        
-        if len(single_word_lines) >= 4:
-            return ' '.join(single_word_lines)
-        
-        # Pattern 3: Extract word list from anywhere in text
-        # Look for sequences of 4+ words separated by spaces/commas
-        # This handles "Here are the words in order: apple banana cherry date"
-        for line in reversed(lines[-15:]):
-            if len(line.strip()) < 20:
-                continue
-            
-            # Extract ALL alphabetic words (2+ chars) from the line
-            all_words = re.findall(r'\b[a-zA-Z]{2,}\b', line)
-            
-            if len(all_words) < 4:
-                continue
-            
-            # Filter out common English stop words and task-related words
-            stopwords = {
-                'the', 'is', 'are', 'in', 'order', 'list', 'sorted', 'words', 
-                'here', 'following', 'final', 'answer', 'alphabetically', 
-                'alphabetical', 'these', 'correct', 'now', 'below'
-            }
-            
-            filtered_words = [w for w in all_words if w.lower() not in stopwords]
-            
-            # If we have 4+ content words after filtering, return them
-            if len(filtered_words) >= 4:
-                return ' '.join(filtered_words)
-        
-        # Pattern 4: Comma-separated list with prefix
-        match = re.search(r'(?:answer|list|result):?\s*([\w\s,]+)', response_text, re.IGNORECASE)
-        if match:
-            extracted = match.group(1).strip().strip(',')
-            words = extracted.replace(',', ' ').split()
-            alphabetic_words = [w for w in words if w.isalpha() and len(w) > 1]
-            if len(alphabetic_words) >= 4:
-                return ' '.join(alphabetic_words)
-    
-    # ============================================================
-    # General Fallback
-    # ============================================================
-    match = re.search(r'answer:\s*(.*)', response_text, re.IGNORECASE | re.DOTALL)
-    if match:
-        try:
-            answer_part = match.group(1).strip()
-            first_line = [line.strip() for line in answer_part.split('\n') if line.strip()][0]
-            return first_line.strip().strip(',')
-        except (IndexError, AttributeError):
-            pass
-    
-    return ""
+    return _extract_cached(task_name, response_text)
 
 
 # ============================================================
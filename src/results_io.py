@@ -0,0 +1,4 @@
+def save_results_parquet(df, path):
+    """Writes a results frame to Parquet: Snappy for the small columns, ZSTD for the long response text."""
+    compression = {col: 'zstd' if col == 'raw_response' else 'snappy' for col in df.columns}
+    df.to_parquet(path, index=False, compression=compression)